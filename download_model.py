@@ -3,19 +3,37 @@
 from __future__ import annotations
 
 import argparse
+import gc
+import hashlib
+import importlib.util
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 from typing import Iterable, List
 
+# Use the Rust-based hf_transfer backend when it is installed; huggingface_hub
+# errors out if the flag is set without the package, so only opt in if present.
+if importlib.util.find_spec("hf_transfer") is not None:
+    os.environ.setdefault("HF_HUB_ENABLE_HF_TRANSFER", "1")
+
 import torch
 from huggingface_hub import HfApi, hf_hub_download
+from huggingface_hub import utils as hf_utils
 from tqdm import tqdm
 from transformers import AutoModelForVision2Seq, BitsAndBytesConfig
 
+from experiment_utils import half_compute_dtype
+
 
 DEFAULT_MODEL_ID = "openvla/openvla-7b"
 DEFAULT_WEIGHTS_DIR = Path("./weights")
+DEFAULT_MAX_WORKERS = 8
+
+
+# One client shared by the listing and path-info lookups.
+_API = HfApi()
 
 
 def setup_logging(log_dir: Path) -> None:
@@ -42,42 +60,130 @@ def setup_logging(log_dir: Path) -> None:
 
 def list_repo_files(model_id: str) -> List[str]:
     """List all files for a model repository."""
-    api = HfApi()
-    return api.list_repo_files(repo_id=model_id, repo_type="model")
+    return _API.list_repo_files(repo_id=model_id, repo_type="model")
+
+
+def _sha256(path: Path, chunk_size: int = 8 * 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 
+def filter_missing_files(
+    model_id: str,
+    weights_dir: Path,
+    files: Iterable[str],
+    verify_checksums: bool = False,
+) -> List[str]:
+    """Return the files that are not already present locally with the expected size.
 
-def download_weights(model_id: str, weights_dir: Path, files: Iterable[str]) -> None:
-    """Download all files from a model repository with a progress bar."""
+    Sizes (and LFS SHA-256 digests, when ``verify_checksums`` is set) come from a
+    single batched ``get_paths_info`` call.
+    """
+    files = list(files)
+    present = [f for f in files if (weights_dir / f).is_file()]
+    if not present:
+        return files
+
+    infos = _API.get_paths_info(repo_id=model_id, paths=present, repo_type="model")
+    complete = set()
+    for info in infos:
+        size = getattr(info, "size", None)
+        local_path = weights_dir / info.path
+        if size is None or local_path.stat().st_size != size:
+            continue
+        lfs = getattr(info, "lfs", None)
+        if verify_checksums and lfs is not None and _sha256(local_path) != lfs.sha256:
+            continue
+        complete.add(info.path)
+
+    missing = [f for f in files if f not in complete]
+    logging.info("Skipping %d/%d files already present in %s", len(complete), len(files), weights_dir)
+    return missing
+
+
+def download_weights(
+    model_id: str,
+    weights_dir: Path,
+    files: Iterable[str],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> None:
+    """Download all files from a model repository concurrently with a progress bar."""
+    files = list(files)
     weights_dir.mkdir(parents=True, exist_ok=True)
     logging.info("Downloading %s to %s", model_id, weights_dir.resolve())
+    if not files:
+        return
+
+    # Downloads are IO-bound, so threads overlap the per-file round-trips.
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(files))))
+    # Concurrent hf_hub_download bars are unpositioned and would interleave with the
+    # overall bar; only the per-file count is shown while the pool runs.
+    bars_were_disabled = hf_utils.are_progress_bars_disabled()
+    hf_utils.disable_progress_bars()
+    try:
+        futures = [
+            executor.submit(
+                hf_hub_download,
+                repo_id=model_id,
+                filename=filename,
+                repo_type="model",
+                local_dir=str(weights_dir),
+            )
+            for filename in files
+        ]
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Downloading files", unit="file"):
+            future.result()
+    except BaseException:
+        # Ctrl-C or a failed file: drop queued downloads instead of waiting on them.
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        if not bars_were_disabled:
+            hf_utils.enable_progress_bars()
+    executor.shutdown(wait=True)
 
-    for filename in tqdm(list(files), desc="Downloading files", unit="file"):
-        hf_hub_download(
-            repo_id=model_id,
-            filename=filename,
-            repo_type="model",
-            local_dir=str(weights_dir),
-        )
+
+def _load_4bit(weights_dir: Path, device_map, cpu_offload: bool = False):
+    compute_dtype = half_compute_dtype()
+    quant_config = BitsAndBytesConfig(
+        load_in_4bit=True,
+        bnb_4bit_compute_dtype=compute_dtype,
+        bnb_4bit_quant_type="nf4",
+        bnb_4bit_use_double_quant=True,
+        llm_int8_enable_fp32_cpu_offload=cpu_offload,
+    )
+    return AutoModelForVision2Seq.from_pretrained(
+        str(weights_dir),
+        device_map=device_map,
+        trust_remote_code=True,
+        quantization_config=quant_config,
+        torch_dtype=compute_dtype,
+        low_cpu_mem_usage=True,
+    )
 
 
 def verify_4bit_load(weights_dir: Path) -> None:
     """Load model in 4-bit from local weights to verify integrity."""
     logging.info("Starting verification load (4-bit) from %s", weights_dir.resolve())
-    
-    try:
-        quant_config = BitsAndBytesConfig(
-            load_in_4bit=True,
-            bnb_4bit_compute_dtype=torch.float16,
-            bnb_4bit_quant_type="nf4",
-            bnb_4bit_use_double_quant=True,
-        )
 
-        model = AutoModelForVision2Seq.from_pretrained(
-            str(weights_dir),
-            device_map="auto",
-            trust_remote_code=True,
-            quantization_config=quant_config,
-        )
+    try:
+        # Pin every shard to GPU 0 so bnb quantizes shard by shard while loading,
+        # instead of letting "auto" dispatch plan around full-precision sizes.
+        device_map = {"": 0} if torch.cuda.is_available() else "auto"
+        model = None
+        try:
+            model = _load_4bit(weights_dir, device_map)
+        except torch.cuda.OutOfMemoryError:
+            logging.warning("Out of GPU memory during verification load; retrying with CPU offload.")
+        if model is None:
+            # Retry outside the except block: the handled exception's traceback would
+            # keep the partial load's GPU tensors alive, hiding them from empty_cache().
+            gc.collect()
+            torch.cuda.empty_cache()
+            model = _load_4bit(weights_dir, "auto", cpu_offload=True)
         model.eval()
         logging.info("Verification succeeded: model loaded in 4-bit.")
     except ImportError as e:
@@ -116,6 +222,17 @@ def parse_args() -> argparse.Namespace:
         default=Path("data/logs"),
         help="Directory to store logs.",
     )
+    parser.add_argument(
+        "--verify-checksums",
+        action="store_true",
+        help="Also compare SHA-256 of already-present LFS files before skipping them.",
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="Number of files to download in parallel.",
+    )
     return parser.parse_args()
 
 
@@ -130,7 +247,8 @@ def main() -> None:
         logging.error("No files found for %s", args.model_id)
         raise SystemExit(1)
 
-    download_weights(args.model_id, args.weights_dir, files)
+    missing = filter_missing_files(args.model_id, args.weights_dir, files, args.verify_checksums)
+    download_weights(args.model_id, args.weights_dir, missing, args.max_workers)
     verify_4bit_load(args.weights_dir)
     logging.info("Done.")
 
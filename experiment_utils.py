@@ -1,16 +1,73 @@
-"""Utility helpers for experiments: logging, CSV, and timestamps."""
+"""Utility helpers for experiments: logging, CSV, timestamps, and frame conversion."""
 
 from __future__ import annotations
 
 import csv
+import io
 import logging
 import os
-from datetime import datetime
-from typing import Dict, Iterable
+import time
+from datetime import datetime, timezone
+from typing import Dict, IO, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+_LAST_SEC = -1
+_LAST_STR = ""
 
 
 def now_iso() -> str:
-    return datetime.utcnow().isoformat()
+    # UTC, second resolution; the formatted string is reused within the same second.
+    global _LAST_SEC, _LAST_STR
+    sec = int(time.time())
+    if sec != _LAST_SEC:
+        _LAST_STR = datetime.fromtimestamp(sec, tz=timezone.utc).isoformat(timespec="seconds")
+        _LAST_SEC = sec
+    return _LAST_STR
+
+
+# Scratch buffers for float -> uint8 frame conversion, keyed by (shape, dtype).
+_FRAME_BUF: Dict[tuple, Tuple[np.ndarray, np.ndarray]] = {}
+
+
+def float_frame_to_uint8(image: np.ndarray) -> np.ndarray:
+    """Convert a [0, 1] float frame to uint8 without per-frame allocations.
+
+    uint8 frames are returned as-is. Otherwise the result lives in a buffer reused
+    for every frame of the same shape and dtype, so the caller must be done with it
+    before converting the next frame.
+    """
+    if image.dtype == np.uint8:
+        return image
+    key = (image.shape, image.dtype)
+    bufs = _FRAME_BUF.get(key)
+    if bufs is None:
+        bufs = _FRAME_BUF[key] = (np.empty(image.shape, dtype=image.dtype), np.empty(image.shape, dtype=np.uint8))
+    scratch, out = bufs
+    np.clip(image, 0, 1, out=scratch)
+    np.multiply(scratch, 255, out=scratch)
+    np.copyto(out, scratch, casting="unsafe")
+    return out
+
+
+def has_native_bf16() -> bool:
+    """Whether the current CUDA GPU has bf16 tensor cores (compute capability 8.0+, Ampere on).
+
+    ``torch.cuda.is_bf16_supported()`` also counts emulated bf16 and so returns
+    True on e.g. a T4 (sm75), where bf16 matmuls are far slower than fp16.
+    """
+    # torch is imported lazily: the Octo (JAX) path imports this module without it.
+    import torch
+
+    return torch.cuda.is_available() and torch.cuda.get_device_capability()[0] >= 8
+
+
+def half_compute_dtype():
+    """bf16 (same width as fp16, wider range) where the GPU runs it natively, else fp16."""
+    import torch
+
+    return torch.bfloat16 if has_native_bf16() else torch.float16
 
 
 def ensure_dir(path: str) -> None:
@@ -47,3 +104,63 @@ def append_csv(path: str, fieldnames: Iterable[str], row: Dict[str, object]) ->
         writer.writerow(row)
 
 
+class CsvSink:
+    """Append rows to a CSV through one long-lived, buffered writer.
+
+    Use as a context manager around a whole phase instead of calling
+    ``append_csv`` per row. Rows are queued and serialized in batches of
+    ``flush_every`` with a single ``write`` per batch, and the remainder is
+    written on exit.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fieldnames: Iterable[str],
+        flush_every: int = 16,
+        buffering: int = 64 * 1024,
+    ) -> None:
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.flush_every = max(1, flush_every)
+        self.buffering = buffering
+        self._file: Optional[IO[str]] = None
+        self._sio = io.StringIO()
+        self._writer = csv.DictWriter(self._sio, fieldnames=self.fieldnames)
+        self._rows: List[Dict[str, object]] = []
+
+    def __enter__(self) -> "CsvSink":
+        ensure_dir(os.path.dirname(self.path))
+        is_new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self._file = open(self.path, "a", newline="", buffering=self.buffering)
+        if is_new:
+            self._writer.writeheader()
+            self._drain()
+        return self
+
+    def write(self, row: Dict[str, object]) -> None:
+        self._rows.append(row)
+        if len(self._rows) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._rows:
+            self._writer.writerows(self._rows)
+            self._rows.clear()
+        self._drain()
+
+    def _drain(self) -> None:
+        if self._file is None:
+            return
+        data = self._sio.getvalue()
+        if data:
+            self._file.write(data)
+            self._sio.seek(0)
+            self._sio.truncate()
+        self._file.flush()
+
+    def __exit__(self, *exc_info) -> None:
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+        self._file = None
@@ -2,9 +2,10 @@
 
 from __future__ import annotations
 
-import random
+import functools
 import re
-from typing import Callable, Dict, List
+import zlib
+from typing import Callable, Dict, List, Pattern, Tuple
 
 
 MUTATION_CATEGORIES: List[str] = [
@@ -21,22 +22,8 @@ MUTATION_CATEGORIES: List[str] = [
 ]
 
 
-def _replace_any(text: str, replacements: Dict[str, List[str]], rng: random.Random) -> str:
-    for key, choices in replacements.items():
-        if re.search(rf"\b{re.escape(key)}\b", text, flags=re.IGNORECASE):
-            replacement = rng.choice(choices)
-            return re.sub(rf"\b{re.escape(key)}\b", replacement, text, flags=re.IGNORECASE)
-    return text
-
-
-def _ensure_change(original: str, mutated: str, fallback: Callable[[], str]) -> str:
-    if mutated.strip().lower() == original.strip().lower():
-        return fallback()
-    return mutated
-
-
-def _synonyms(text: str, rng: random.Random) -> str:
-    replacements = {
+_REPLACEMENTS: Dict[str, Dict[str, List[str]]] = {
+    "synonyms": {
         "pick": ["grab", "lift", "take"],
         "move": ["shift", "relocate", "transport"],
         "place": ["put", "set", "position"],
@@ -46,21 +33,157 @@ def _synonyms(text: str, rng: random.Random) -> str:
         "close": ["shut", "seal", "push closed"],
         "into": ["inside", "in"],
         "on": ["on top of"],
-    }
+    },
+    "spatial_reordering": {
+        "left": ["on the left", "to your left"],
+        "right": ["on the right", "to your right"],
+        "front": ["in front", "ahead"],
+        "behind": ["in the back", "behind you"],
+    },
+    "formal_informal": {
+        "get": ["retrieve", "obtain"],
+        "grab": ["retrieve", "obtain"],
+        "take": ["retrieve", "obtain"],
+        "move": ["relocate", "transport"],
+        "put": ["place", "deposit"],
+        "pick": ["retrieve", "lift"],
+    },
+    "verb_phrasing": {
+        "pick up": ["lift up", "raise", "collect"],
+        "move": ["move over", "carry", "bring"],
+        "place": ["set down", "put down"],
+        "put": ["set down", "drop off"],
+        "stack": ["pile up", "stack up"],
+        "open": ["pull open", "swing open"],
+        "close": ["push shut", "swing shut"],
+    },
+    "object_descriptors": {
+        "red": ["crimson", "scarlet"],
+        "green": ["emerald", "lime"],
+        "blue": ["azure", "navy"],
+        "coke": ["soda", "cola"],
+        "eggplant": ["purple eggplant", "fresh eggplant"],
+        "basket": ["wire basket", "small basket"],
+        "carrot": ["orange carrot", "fresh carrot"],
+    },
+    "directional_language": {
+        "toward": ["in the direction of", "closer to"],
+        "near": ["close to", "adjacent to"],
+        "away": ["farther from", "further from"],
+    },
+}
+
+# (pattern, choices, salt) per key; the salt decorrelates picks across keys.
+_CompiledTable = List[Tuple[Pattern[str], List[str], int]]
+# One alternation over every key of a table plus the choices and salts indexed by group.
+_Alternation = Tuple[Pattern[str], List[List[str]], List[int]]
+
+
+def _salt(name: str) -> int:
+    # crc32 rather than hash(): str hashes are randomized per process.
+    return zlib.crc32(name.encode("utf-8"))
+
+
+def _pick(choices: List[str], seed: int, salt: int) -> str:
+    """Deterministically pick one of ``choices`` for ``seed`` without a PRNG object."""
+    return choices[((seed * 2654435761 + salt) & 0xFFFFFFFF) % len(choices)]
+
+
+def _key_pattern(key: str, word_boundary: bool) -> str:
+    return rf"\b{re.escape(key)}\b" if word_boundary else re.escape(key)
+
+
+def _compile_table(table: Dict[str, List[str]], word_boundary: bool = True) -> _CompiledTable:
+    return [
+        (re.compile(_key_pattern(key, word_boundary), flags=re.IGNORECASE), choices, _salt(key))
+        for key, choices in table.items()
+    ]
+
+
+def _compile_alternation(table: Dict[str, List[str]], word_boundary: bool = True) -> _Alternation:
+    # Alternatives keep table order, so ties at the same position go to the earlier key.
+    pattern = "|".join(f"({_key_pattern(key, word_boundary)})" for key in table)
+    return re.compile(pattern, flags=re.IGNORECASE), list(table.values()), [_salt(key) for key in table]
+
+
+# Compiled once at import; mutators run tasks x categories x seeds times per campaign.
+# Synonyms chain substitutions key by key, so it keeps one pattern per key.
+_COMPILED: Dict[str, _CompiledTable] = {"synonyms": _compile_table(_REPLACEMENTS["synonyms"])}
+_ALTERNATIONS: Dict[str, _Alternation] = {
+    category: _compile_alternation(table, word_boundary=category != "verb_phrasing")
+    for category, table in _REPLACEMENTS.items()
+    if category != "synonyms"
+}
+
+_LEADING_WORD_RE = re.compile(r"^(\w+)(.*)$")
+_SPATIAL_PHRASE_RE = re.compile(r"\b(into|in|on|inside)\b\s+([^,]+)", flags=re.IGNORECASE)
+_NOW_RE = re.compile(r"\bnow\b", flags=re.IGNORECASE)
+_CAREFULLY_RE = re.compile(r"\bcarefully\b", flags=re.IGNORECASE)
+
+_TEMPORAL_CHOICES = ["right away", "immediately"]
+_NEGATION_LEADS = ["Don't forget to", "Please remember to", "Make sure to"]
+_TEMPORAL_SALT = _salt("temporal_modifiers")
+_NEGATION_SALT = _salt("negation_positive")
+_FORMAL_FALLBACK_SALT = _salt("formal_informal")
+
+
+def _find_key(text: str, alternation: _Alternation) -> Tuple[int, List[Tuple[int, int]]]:
+    """Return the earliest-listed key that occurs in ``text`` and all of its spans.
+
+    Single scan over the text; equivalent to trying each key's pattern in table order.
+    """
+    pattern = alternation[0]
+    best = -1
+    spans: List[Tuple[int, int]] = []
+    for m in pattern.finditer(text):
+        index = m.lastindex - 1
+        if best < 0 or index < best:
+            best, spans = index, [m.span()]
+        elif index == best:
+            spans.append(m.span())
+    return best, spans
+
+
+def _substitute(text: str, spans: List[Tuple[int, int]], replacement: str) -> str:
+    pieces = []
+    last = 0
+    for start, end in spans:
+        pieces.append(text[last:start])
+        pieces.append(replacement)
+        last = end
+    pieces.append(text[last:])
+    return "".join(pieces)
+
+
+def _replace_any(text: str, alternation: _Alternation, seed: int) -> str:
+    index, spans = _find_key(text, alternation)
+    if index < 0:
+        return text
+    replacement = _pick(alternation[1][index], seed, alternation[2][index])
+    return _substitute(text, spans, replacement)
+
+
+def _ensure_change(original: str, mutated: str, fallback: Callable[[], str]) -> str:
+    if mutated.strip().lower() == original.strip().lower():
+        return fallback()
+    return mutated
+
+
+def _synonyms(text: str, seed: int) -> str:
     mutated = text
     changed = False
-    for key, choices in replacements.items():
-        if re.search(rf"\b{re.escape(key)}\b", mutated, flags=re.IGNORECASE):
-            replacement = rng.choice(choices)
-            mutated = re.sub(rf"\b{re.escape(key)}\b", replacement, mutated, flags=re.IGNORECASE)
+    for pattern, choices, salt in _COMPILED["synonyms"]:
+        if pattern.search(mutated):
+            replacement = _pick(choices, seed, salt)
+            mutated = pattern.sub(replacement, mutated)
             changed = True
     if not changed:
         mutated = f"Please {text[0].lower() + text[1:]}"
     return _ensure_change(text, mutated, lambda: f"Please {text[0].lower() + text[1:]}")
 
 
-def _passive_voice(text: str, rng: random.Random) -> str:
-    m = re.match(r"^(\\w+)(.*)$", text.strip())
+def _passive_voice(text: str, seed: int) -> str:
+    m = _LEADING_WORD_RE.match(text.strip())
     if not m:
         return f"{text} should be done."
     verb, rest = m.group(1), m.group(2).strip()
@@ -69,105 +192,71 @@ def _passive_voice(text: str, rng: random.Random) -> str:
     return f"{rest} should be {verb.lower()}ed."
 
 
-def _spatial_reordering(text: str, rng: random.Random) -> str:
+def _spatial_reordering(text: str, seed: int) -> str:
     # Try to front-load a spatial phrase like "into X" or "on Y".
-    m = re.search(r"\b(into|in|on|inside)\b\s+([^,]+)", text, flags=re.IGNORECASE)
+    m = _SPATIAL_PHRASE_RE.search(text)
     if m:
         phrase = f"{m.group(1)} {m.group(2).strip()}"
         rest = re.sub(re.escape(m.group(0)), "", text, flags=re.IGNORECASE).strip()
         mutated = f"{phrase.capitalize()}, {rest}"
         return _ensure_change(text, mutated, lambda: text)
     # Fallback to spatial word substitution.
-    replacements = {
-        "left": ["on the left", "to your left"],
-        "right": ["on the right", "to your right"],
-        "front": ["in front", "ahead"],
-        "behind": ["in the back", "behind you"],
-    }
-    mutated = _replace_any(text, replacements, rng)
+    mutated = _replace_any(text, _ALTERNATIONS["spatial_reordering"], seed)
     return _ensure_change(text, mutated, lambda: f"{text} on the left side.")
 
 
-def _formal_informal(text: str, rng: random.Random) -> str:
-    replacements = {
-        "get": ["retrieve", "obtain"],
-        "grab": ["retrieve", "obtain"],
-        "take": ["retrieve", "obtain"],
-        "move": ["relocate", "transport"],
-        "put": ["place", "deposit"],
-        "pick": ["retrieve", "lift"],
-    }
-    mutated = _replace_any(text, replacements, rng)
+def _formal_informal(text: str, seed: int) -> str:
+    mutated = _replace_any(text, _ALTERNATIONS["formal_informal"], seed)
     return _ensure_change(
         text,
         mutated,
-        lambda: rng.choice(
-            [f"Please {text[0].lower() + text[1:]}", f"Hey, {text[0].lower() + text[1:]}"]
+        lambda: _pick(
+            [f"Please {text[0].lower() + text[1:]}", f"Hey, {text[0].lower() + text[1:]}"],
+            seed,
+            _FORMAL_FALLBACK_SALT,
         ),
     )
 
 
-def _verb_phrasing(text: str, rng: random.Random) -> str:
-    replacements = {
-        "pick up": ["lift up", "raise", "collect"],
-        "move": ["move over", "carry", "bring"],
-        "place": ["set down", "put down"],
-        "put": ["set down", "drop off"],
-        "stack": ["pile up", "stack up"],
-        "open": ["pull open", "swing open"],
-        "close": ["push shut", "swing shut"],
-    }
-    for key, choices in replacements.items():
-        if key in text.lower():
-            mutated = re.sub(key, rng.choice(choices), text, flags=re.IGNORECASE)
-            return _ensure_change(text, mutated, lambda: text)
+def _verb_phrasing(text: str, seed: int) -> str:
+    alternation = _ALTERNATIONS["verb_phrasing"]
+    index, spans = _find_key(text, alternation)
+    if index >= 0:
+        mutated = _substitute(text, spans, _pick(alternation[1][index], seed, alternation[2][index]))
+        return _ensure_change(text, mutated, lambda: text)
     return f"Go ahead and {text[0].lower() + text[1:]}"
 
 
-def _object_descriptors(text: str, rng: random.Random) -> str:
-    replacements = {
-        "red": ["crimson", "scarlet"],
-        "green": ["emerald", "lime"],
-        "blue": ["azure", "navy"],
-        "coke": ["soda", "cola"],
-        "eggplant": ["purple eggplant", "fresh eggplant"],
-        "basket": ["wire basket", "small basket"],
-        "carrot": ["orange carrot", "fresh carrot"],
-    }
-    mutated = _replace_any(text, replacements, rng)
+def _object_descriptors(text: str, seed: int) -> str:
+    mutated = _replace_any(text, _ALTERNATIONS["object_descriptors"], seed)
     return _ensure_change(text, mutated, lambda: f"{text} using the item in view.")
 
 
-def _directional_language(text: str, rng: random.Random) -> str:
-    replacements = {
-        "toward": ["in the direction of", "closer to"],
-        "near": ["close to", "adjacent to"],
-        "away": ["farther from", "further from"],
-    }
-    mutated = _replace_any(text, replacements, rng)
+def _directional_language(text: str, seed: int) -> str:
+    mutated = _replace_any(text, _ALTERNATIONS["directional_language"], seed)
     return _ensure_change(text, mutated, lambda: f"{text} toward the target.")
 
 
-def _temporal_modifiers(text: str, rng: random.Random) -> str:
+def _temporal_modifiers(text: str, seed: int) -> str:
     if "now" in text.lower():
-        return re.sub(r"\bnow\b", rng.choice(["right away", "immediately"]), text, flags=re.IGNORECASE)
+        return _NOW_RE.sub(_pick(_TEMPORAL_CHOICES, seed, _TEMPORAL_SALT), text)
     return f"{text} right away."
 
 
-def _negation_positive(text: str, rng: random.Random) -> str:
+def _negation_positive(text: str, seed: int) -> str:
     if "don't" in text.lower() or "do not" in text.lower():
         return text.replace("don't", "avoid").replace("do not", "avoid")
-    lead = rng.choice(["Don't forget to", "Please remember to", "Make sure to"])
+    lead = _pick(_NEGATION_LEADS, seed, _NEGATION_SALT)
     return f"{lead} {text[0].lower() + text[1:]}"
 
 
-def _complexity_variation(text: str, rng: random.Random) -> str:
+def _complexity_variation(text: str, seed: int) -> str:
     if "carefully" in text.lower():
-        return re.sub(r"\bcarefully\b", "", text, flags=re.IGNORECASE).strip()
+        return _CAREFULLY_RE.sub("", text).strip()
     return f"Carefully {text[0].lower() + text[1:]}"
 
 
-_MUTATORS: Dict[str, Callable[[str, random.Random], str]] = {
+_MUTATORS: Dict[str, Callable[[str, int], str]] = {
     "synonyms": _synonyms,
     "passive_voice": _passive_voice,
     "spatial_reordering": _spatial_reordering,
@@ -181,12 +270,19 @@ _MUTATORS: Dict[str, Callable[[str, random.Random], str]] = {
 }
 
 
-def generate_mutation(instruction: str, category: str, seed: int) -> str:
-    """Generate a mutated instruction for the given category."""
-    rng = random.Random(seed)
+def _generate_mutation_impl(instruction: str, category: str, seed: int) -> str:
     mutator = _MUTATORS.get(category)
     if mutator is None:
         return instruction
-    mutated = mutator(instruction, rng).strip()
+    mutated = mutator(instruction, seed).strip()
     return mutated if mutated else instruction
 
+
+@functools.lru_cache(maxsize=8192)
+def generate_mutation(instruction: str, category: str, seed: int) -> str:
+    """Generate a mutated instruction for the given category.
+
+    Pure in its arguments, so results are memoized; call
+    ``generate_mutation.cache_clear()`` to reset between runs.
+    """
+    return _generate_mutation_impl(instruction, category, seed)
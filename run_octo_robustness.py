@@ -4,12 +4,17 @@
 from __future__ import annotations
 
 import argparse
+import functools
 import json
+import multiprocessing as mp
 import os
+import subprocess
 import warnings
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import Dict, Iterable, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
+import jax
 import numpy as np
 from tqdm import tqdm
 
@@ -22,7 +27,7 @@ os.environ.setdefault("USE_TORCH", "0")
 import simpler_env
 from simpler_env.policies.octo.octo_model import OctoInference
 
-from experiment_utils import append_csv, now_iso, setup_logger
+from experiment_utils import CsvSink, float_frame_to_uint8, now_iso, setup_logger
 from mutation_generator import MUTATION_CATEGORIES, generate_mutation
 
 try:
@@ -30,6 +35,11 @@ try:
 except Exception:  # pragma: no cover - optional dependency
     yaml = None
 
+try:
+    import orjson
+except Exception:  # pragma: no cover - optional dependency
+    orjson = None
+
 
 DEFAULT_FIELDS = [
     "trial_id",
@@ -62,15 +72,28 @@ class RunConfig:
     results_path: str
     log_path: str
     locked_config_path: str
+    workers: int
 
 
 def _load_config(path: str) -> Dict[str, object]:
+    if path.endswith(".json") and orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
     with open(path, "r") as f:
         if path.endswith(".json") or yaml is None:
             return json.load(f)
         return yaml.safe_load(f)
 
 
+def _dump_json(obj: Dict[str, object], path: str) -> None:
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+        return
+    with open(path, "w") as f:
+        json.dump(obj, f, indent=2)
+
+
 def _to_run_config(cfg: Dict[str, object]) -> RunConfig:
     return RunConfig(
         policy=cfg["policy"],
@@ -87,21 +110,27 @@ def _to_run_config(cfg: Dict[str, object]) -> RunConfig:
         results_path=str(cfg.get("results_path", "data/results/results.csv")),
         log_path=str(cfg.get("log_path", "data/logs/experiment.log")),
         locked_config_path=str(cfg.get("locked_config_path", "data/logs/locked_config.json")),
+        workers=int(cfg.get("workers", 1)),
     )
 
 
-def _augment_ld_library_path() -> None:
-    # Ensure CUDA/cuDNN libs from pip packages are visible to JAX.
+@functools.lru_cache(maxsize=None)
+def _nvidia_lib_dirs() -> Tuple[str, ...]:
+    # Globbing every site-packages dir is the slow part; do it once per process.
     import site
     import glob
 
     lib_dirs: List[str] = []
     for p in site.getsitepackages():
         lib_dirs.extend(glob.glob(os.path.join(p, "nvidia", "*", "lib")))
+    return tuple(lib_dirs)
+
 
+def _augment_ld_library_path() -> None:
+    # Ensure CUDA/cuDNN libs from pip packages are visible to JAX.
     existing = os.environ.get("LD_LIBRARY_PATH", "")
     parts = [p for p in existing.split(":") if p]
-    for d in lib_dirs:
+    for d in _nvidia_lib_dirs():
         if d not in parts:
             parts.append(d)
     os.environ["LD_LIBRARY_PATH"] = ":".join(parts)
@@ -131,24 +160,94 @@ def _suppress_noisy_warnings() -> None:
 
 
 def _get_rgb(obs: dict, camera: str) -> np.ndarray:
-    cam = obs["image"][camera]
-    rgb = cam["rgb"]
-    if rgb.dtype != np.uint8:
-        rgb = (np.clip(rgb, 0, 1) * 255).astype(np.uint8)
-    return rgb
+    # The converted frame's buffer is reused; safe because OctoInference resizes (copies) it every step.
+    return float_frame_to_uint8(obs["image"][camera]["rgb"])
+
+
+# One OctoInference per (policy, policy_setup); loading weights and jit-compiling
+# the sampler dominate start-up, so episodes share an instance and only reseed it.
+_MODEL_CACHE: Dict[Tuple[str, str], OctoInference] = {}
+
+
+def _get_policy(config: RunConfig, seed: int) -> OctoInference:
+    key = (config.policy, config.policy_setup)
+    model = _MODEL_CACHE.get(key)
+    if model is None:
+        model = OctoInference(model_type=config.policy, policy_setup=config.policy_setup, init_rng=seed)
+        _MODEL_CACHE[key] = model
+    else:
+        # Same key sequence as OctoInference(init_rng=seed), which splits 5 times on init.
+        model.rng = jax.random.PRNGKey(seed)
+        for _ in range(5):
+            model.rng, _key = jax.random.split(model.rng)
+    return model
+
+
+class EpisodeRunner:
+    """Owns one env per task and skips resets that would repeat the current state.
+
+    The instruction for a (task, seed) is read once from a reset env and cached.
+    That reset's observation is kept until the next episode on the same task:
+    if the episode is for the same seed, it starts from it instead of resetting
+    again. Any episode consumes the state, so later episodes always reset.
+    """
+
+    def __init__(self) -> None:
+        self._envs: Dict[str, object] = {}
+        self._instructions: Dict[Tuple[str, int], str] = {}
+        self._fresh: Dict[str, Tuple[int, dict]] = {}
+
+    def env(self, task: str):
+        env = self._envs.get(task)
+        if env is None:
+            env = self._envs[task] = simpler_env.make(task)
+        return env
+
+    def instruction(self, task: str, seed: int) -> str:
+        key = (task, seed)
+        instruction = self._instructions.get(key)
+        if instruction is None:
+            env = self.env(task)
+            obs, _ = env.reset(seed=seed)
+            self._fresh[task] = (seed, obs)
+            instruction = self._instructions[key] = env.get_language_instruction()
+        return instruction
+
+    def reset(self, task: str, seed: int) -> dict:
+        fresh = self._fresh.pop(task, None)
+        if fresh is not None and fresh[0] == seed:
+            return fresh[1]
+        obs, _ = self.env(task).reset(seed=seed)
+        return obs
+
+    def run(
+        self,
+        task: str,
+        instruction: str,
+        seed: int,
+        config: RunConfig,
+        action_scale: float,
+        logger,
+    ) -> Dict[str, object]:
+        obs = self.reset(task, seed)
+        return _run_episode(self.env(task), obs, instruction, seed, config, action_scale, logger)
+
+
+# One runner per process (workers get their own).
+_RUNNER = EpisodeRunner()
 
 
 def _run_episode(
-    task: str,
+    env,
+    obs: dict,
     instruction: str,
     seed: int,
     config: RunConfig,
     action_scale: float,
     logger,
 ) -> Dict[str, object]:
-    env = simpler_env.make(task)
-    obs, _ = env.reset(seed=seed)
-    model = OctoInference(model_type=config.policy, policy_setup=config.policy_setup, init_rng=seed)
+    """Roll out one episode from ``obs``, the observation of ``env`` just reset with ``seed``."""
+    model = _get_policy(config, seed)
     model.reset(instruction)
 
     image = _get_rgb(obs, config.camera)
@@ -158,23 +257,24 @@ def _run_episode(
     notes = ""
     sticky_remaining = 0
     last_reward: Optional[float] = None
+    # [world_vector(3), rot_axangle(3), gripper(1)], filled in place every step.
+    action_buf = np.empty(7, dtype=np.float64)
 
     for _ in range(config.max_steps):
         raw_action, action = model.step(image, instruction)
-        action["world_vector"] = action["world_vector"] * action_scale
-        action["rot_axangle"] = action["rot_axangle"] * action_scale
+        np.multiply(action["world_vector"], action_scale, out=action_buf[0:3])
+        np.multiply(action["rot_axangle"], action_scale, out=action_buf[3:6])
+        action_buf[6] = action["gripper"][0]
 
         if config.heuristic_grasp_steps > 0:
             if sticky_remaining > 0:
-                action["gripper"] = np.array([-1.0])
+                action_buf[6] = -1.0
                 sticky_remaining -= 1
-            elif action["gripper"][0] < -0.5:
-                action["gripper"] = np.array([-1.0])
+            elif action_buf[6] < -0.5:
+                action_buf[6] = -1.0
                 sticky_remaining = config.heuristic_grasp_steps
 
-        obs, reward, terminated, truncated, info = env.step(
-            np.concatenate([action["world_vector"], action["rot_axangle"], action["gripper"]])
-        )
+        obs, reward, terminated, truncated, info = env.step(action_buf)
         last_reward = reward
         steps += 1
         if terminated or truncated:
@@ -198,89 +298,176 @@ def _run_episode(
 def calibrate_action_scale(task: str, config: RunConfig, logger) -> float:
     best_scale = config.action_scale
     best_sr = -1.0
+    best_successes = -1
+    episodes = config.calibration_episodes
     logger.info("Starting action scale calibration on %s", task)
     for scale in tqdm(config.calibration_scales, desc="Calibrate scales", unit="scale"):
         successes = 0
-        for i in range(config.calibration_episodes):
+        pruned = False
+        for i in range(episodes):
             seed = config.seeds[i % len(config.seeds)]
-            env = simpler_env.make(task)
-            obs, _ = env.reset(seed=seed)
-            instruction = env.get_language_instruction()
-            result = _run_episode(task, instruction, seed, config, scale, logger)
+            instruction = _RUNNER.instruction(task, seed)
+            result = _RUNNER.run(task, instruction, seed, config, scale, logger)
             if result["success"]:
                 successes += 1
-        sr = successes / max(1, config.calibration_episodes)
+            remaining = episodes - i - 1
+            # Ties keep the earlier scale, so a scale that can at best tie is done.
+            if remaining and successes + remaining <= best_successes:
+                logger.info(
+                    "Scale %.3f pruned after %d/%d episodes (%d successes cannot beat %d)",
+                    scale,
+                    i + 1,
+                    episodes,
+                    successes,
+                    best_successes,
+                )
+                pruned = True
+                break
+        if pruned:
+            continue
+        sr = successes / max(1, episodes)
         logger.info("Scale %.3f -> SR %.2f", scale, sr)
         if sr > best_sr:
             best_sr = sr
             best_scale = scale
+            best_successes = successes
+        if successes == episodes:
+            logger.info("Scale %.3f reached SR 1.00; skipping remaining scales", scale)
+            break
     logger.info("Selected action scale: %.3f (SR %.2f)", best_scale, best_sr)
     return best_scale
 
 
+def _run_trial(task: str, category: str, seed: int, config: RunConfig, action_scale: float) -> Dict[str, object]:
+    original = _RUNNER.instruction(task, seed)
+    if category == "baseline":
+        instruction = original
+    else:
+        instruction = generate_mutation(original, category, seed)
+    result = _RUNNER.run(task, instruction, seed, config, action_scale, None)
+    result["original_instruction"] = original
+    result["mutated_instruction"] = instruction
+    return result
+
+
+def _run_trial_from_args(args: Tuple[str, str, int, RunConfig, float]) -> Dict[str, object]:
+    return _run_trial(*args)
+
+
+def _gpu_devices() -> List[str]:
+    """GPU ids for the worker round-robin: ``CUDA_VISIBLE_DEVICES`` if set, else nvidia-smi's list."""
+    visible = [d.strip() for d in os.environ.get("CUDA_VISIBLE_DEVICES", "").split(",") if d.strip()]
+    if visible:
+        return visible
+    # Ask nvidia-smi rather than JAX so the parent does not initialize CUDA before spawning.
+    try:
+        out = subprocess.run(
+            ["nvidia-smi", "--query-gpu=index", "--format=csv,noheader"],
+            capture_output=True,
+            text=True,
+            timeout=10,
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return []
+    return [line.strip() for line in out.splitlines() if line.strip()]
+
+
+def _limit_gpu_preallocation() -> None:
+    # JAX grabs 75% of VRAM and TF (used by OctoInference to resize frames)
+    # nearly all of it on first use; with several processes per GPU both must grow on demand.
+    os.environ.setdefault("XLA_PYTHON_CLIENT_PREALLOCATE", "false")
+    os.environ.setdefault("TF_FORCE_GPU_ALLOW_GROWTH", "true")
+
+
+def _init_worker(counter, devices: List[str]) -> None:
+    # Runs in each spawned worker before JAX/TF touch the GPU.
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    if devices:
+        # nvidia-smi numbers GPUs in PCI bus order; make CUDA agree.
+        os.environ.setdefault("CUDA_DEVICE_ORDER", "PCI_BUS_ID")
+        os.environ["CUDA_VISIBLE_DEVICES"] = devices[index % len(devices)]
+    _limit_gpu_preallocation()
+
+
+def _run_trials(
+    trials: List[Tuple[str, str, int]], config: RunConfig, action_scale: float
+) -> Iterable[Dict[str, object]]:
+    """Yield trial results in ``trials`` order, using ``config.workers`` processes.
+
+    Workers are spread round-robin over the visible GPUs. With fewer GPUs than
+    workers they share a device, so each process holds its own Octo copy and
+    activations; on a single 16 GB GPU keep ``workers`` small.
+    """
+    if config.workers <= 1:
+        for task, category, seed in trials:
+            yield _run_trial(task, category, seed, config, action_scale)
+        return
+
+    # spawn so every worker initializes JAX/CUDA itself instead of inheriting a forked state.
+    ctx = mp.get_context("spawn")
+    counter = ctx.Value("i", 0)
+    with ProcessPoolExecutor(
+        max_workers=config.workers,
+        mp_context=ctx,
+        initializer=_init_worker,
+        initargs=(counter, _gpu_devices()),
+    ) as ex:
+        yield from ex.map(
+            _run_trial_from_args,
+            [(task, category, seed, config, action_scale) for task, category, seed in trials],
+        )
+
+
+def _result_row(trial_id: int, task: str, category: str, seed: int, result: Dict[str, object]) -> Dict[str, object]:
+    return {
+        "trial_id": trial_id,
+        "task": task,
+        "mutation_category": category,
+        "original_instruction": result["original_instruction"],
+        "mutated_instruction": result["mutated_instruction"],
+        "success": result["success"],
+        "distance_to_target": result["distance_to_target"],
+        "episode_length": result["episode_length"],
+        "timestamp": now_iso(),
+        "seed": seed,
+        "notes": result["notes"],
+    }
+
+
 def run_baseline(config: RunConfig, action_scale: float, logger) -> float:
     total = 0
     successes = 0
-    trial_id = 0
-    total_iters = len(config.tasks) * len(config.seeds)
-    with tqdm(total=total_iters, desc="Baseline", unit="trial") as pbar:
-        for task in config.tasks:
-            for seed in config.seeds:
-                env = simpler_env.make(task)
-                obs, _ = env.reset(seed=seed)
-                instruction = env.get_language_instruction()
-                result = _run_episode(task, instruction, seed, config, action_scale, logger)
-                row = {
-                    "trial_id": trial_id,
-                    "task": task,
-                    "mutation_category": "baseline",
-                    "original_instruction": instruction,
-                    "mutated_instruction": instruction,
-                    "success": result["success"],
-                    "distance_to_target": result["distance_to_target"],
-                    "episode_length": result["episode_length"],
-                    "timestamp": now_iso(),
-                    "seed": seed,
-                    "notes": result["notes"],
-                }
-                append_csv(config.results_path, DEFAULT_FIELDS, row)
-                successes += int(result["success"])
-                total += 1
-                trial_id += 1
-                pbar.update(1)
+    trials = [(task, "baseline", seed) for task in config.tasks for seed in config.seeds]
+    with CsvSink(config.results_path, DEFAULT_FIELDS) as sink, tqdm(
+        total=len(trials), desc="Baseline", unit="trial"
+    ) as pbar:
+        results = _run_trials(trials, config, action_scale)
+        for trial_id, ((task, category, seed), result) in enumerate(zip(trials, results)):
+            sink.write(_result_row(trial_id, task, category, seed, result))
+            successes += int(result["success"])
+            total += 1
+            pbar.update(1)
     sr = successes / max(1, total)
     logger.info("Baseline SR %.3f (%d/%d)", sr, successes, total)
     return sr
 
 
 def run_mutations(config: RunConfig, action_scale: float, logger) -> None:
-    trial_id = 0
-    total_iters = len(config.tasks) * len(MUTATION_CATEGORIES) * len(config.seeds)
-    with tqdm(total=total_iters, desc="Mutations", unit="trial") as pbar:
-        for task in config.tasks:
-            for category in MUTATION_CATEGORIES:
-                for seed in config.seeds:
-                    env = simpler_env.make(task)
-                    obs, _ = env.reset(seed=seed)
-                    original = env.get_language_instruction()
-                    mutated = generate_mutation(original, category, seed)
-                    result = _run_episode(task, mutated, seed, config, action_scale, logger)
-                    row = {
-                        "trial_id": trial_id,
-                        "task": task,
-                        "mutation_category": category,
-                        "original_instruction": original,
-                        "mutated_instruction": mutated,
-                        "success": result["success"],
-                        "distance_to_target": result["distance_to_target"],
-                        "episode_length": result["episode_length"],
-                        "timestamp": now_iso(),
-                        "seed": seed,
-                        "notes": result["notes"],
-                    }
-                    append_csv(config.results_path, DEFAULT_FIELDS, row)
-                    trial_id += 1
-                    pbar.update(1)
+    trials = [
+        (task, category, seed)
+        for task in config.tasks
+        for category in MUTATION_CATEGORIES
+        for seed in config.seeds
+    ]
+    with CsvSink(config.results_path, DEFAULT_FIELDS) as sink, tqdm(
+        total=len(trials), desc="Mutations", unit="trial"
+    ) as pbar:
+        results = _run_trials(trials, config, action_scale)
+        for trial_id, ((task, category, seed), result) in enumerate(zip(trials, results)):
+            sink.write(_result_row(trial_id, task, category, seed, result))
+            pbar.update(1)
 
 
 def main() -> None:
@@ -291,12 +478,17 @@ def main() -> None:
     args = parser.parse_args()
 
     os.environ["JAX_PLATFORM_NAME"] = args.jax_platform
-    _augment_ld_library_path()
+    if args.jax_platform == "gpu":
+        _augment_ld_library_path()
     _suppress_noisy_warnings()
 
     cfg = _load_config(args.config)
     config = _to_run_config(cfg)
     logger = setup_logger(config.log_path)
+    if config.workers > 1:
+        # Before any policy is built here (calibration runs in this process), so the
+        # parent leaves VRAM for the worker pool.
+        _limit_gpu_preallocation()
 
     action_scale = config.action_scale
     if args.phase in ["align", "all"]:
@@ -305,8 +497,7 @@ def main() -> None:
         locked = cfg.copy()
         locked["action_scale"] = action_scale
         locked["baseline_sr"] = baseline_sr
-        with open(config.locked_config_path, "w") as f:
-            json.dump(locked, f, indent=2)
+        _dump_json(locked, config.locked_config_path)
         if baseline_sr < config.baseline_min_sr:
             logger.warning(
                 "Baseline SR %.3f < %.3f; do not proceed to mutations.",
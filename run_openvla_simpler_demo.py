@@ -4,18 +4,28 @@
 from __future__ import annotations
 
 import argparse
+import functools
+import math
 import os
-from typing import Tuple
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Tuple
+
+# Persist Inductor/Triton artifacts across runs so --compile only pays the full
+# warm-up once; must be set before torch is imported.
+os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.expanduser("~/.cache/openvla_inductor"))
 
 import imageio.v2 as imageio
 import numpy as np
 from PIL import Image
 import torch
-from transforms3d.euler import euler2axangle
+import torchvision.transforms.functional as TVF
 from transformers import AutoModelForVision2Seq, AutoProcessor, BitsAndBytesConfig
 
 import simpler_env
 
+from experiment_utils import float_frame_to_uint8, half_compute_dtype, has_native_bf16
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="OpenVLA-7B SIMPLER demo.")
@@ -46,12 +56,29 @@ def parse_args() -> argparse.Namespace:
         default=200,
         help="Maximum rollout steps.",
     )
+    parser.add_argument(
+        "--early-stop-steps",
+        type=int,
+        default=0,
+        help="Steps to keep recording after the env reports success (-1 disables early stop).",
+    )
     parser.add_argument(
         "--action-scale",
         type=float,
         default=1.0,
         help="Scale factor for world/rotation actions.",
     )
+    parser.add_argument(
+        "--quant",
+        choices=["bf16", "fp16", "nf4"],
+        default="bf16",
+        help="GPU weight format; bf16/fp16 fall back to nf4 when free VRAM is too small.",
+    )
+    parser.add_argument(
+        "--compile",
+        action="store_true",
+        help="torch.compile the language model (reduce-overhead); first call takes ~1 min.",
+    )
     parser.add_argument(
         "--save-video",
         default="openvla_rollout.mp4",
@@ -60,26 +87,289 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
+# OpenVLA-7B needs ~15 GB in 16-bit; below this much free VRAM, use NF4 instead.
+MIN_FREE_VRAM_16BIT = 16 * 1024**3
+
+
+def from_pretrained(weights_path: str, **kwargs):
+    """Load OpenVLA, requesting PyTorch SDPA attention instead of the eager default.
+
+    Remote-code OpenVLA classes that do not declare SDPA support are rejected by
+    transformers at load time; those are reloaded with their default attention.
+    """
+    try:
+        return AutoModelForVision2Seq.from_pretrained(
+            weights_path, trust_remote_code=True, attn_implementation="sdpa", **kwargs
+        )
+    except ValueError as exc:
+        if "scaled_dot_product_attention" not in str(exc):
+            raise
+        print("This OpenVLA class does not support SDPA; loading with its default attention.")
+    return AutoModelForVision2Seq.from_pretrained(weights_path, trust_remote_code=True, **kwargs)
+
+
+def load_model(weights_path: str, quant: str, device: str):
+    """Load OpenVLA in the requested format; NF4 only when asked or when 16-bit won't fit."""
+    if device != "cuda":
+        # bf16 halves the footprint of float32 and engages oneDNN bf16 kernels on CPUs that have them.
+        torch.set_num_threads(os.cpu_count() or 1)
+        torch.backends.mkldnn.enabled = True
+        model = from_pretrained(
+            weights_path,
+            torch_dtype=torch.bfloat16,
+            low_cpu_mem_usage=True,
+        )
+        return model.to(device, dtype=torch.bfloat16)
+
+    # With one GPU, place everything on it directly: "auto" installs accelerate
+    # dispatch hooks on every submodule that run on each forward for no benefit.
+    device_map = {"": 0} if torch.cuda.device_count() == 1 else "auto"
+
+    if quant == "bf16" and not has_native_bf16():
+        print("This GPU only emulates bf16; loading fp16 instead.")
+        quant = "fp16"
+
+    if quant != "nf4":
+        free, _ = torch.cuda.mem_get_info()
+        if free < MIN_FREE_VRAM_16BIT:
+            print(f"Only {free / 1024**3:.1f} GiB free VRAM; loading NF4 instead of {quant}.")
+            quant = "nf4"
+
+    if quant == "nf4":
+        # At batch size 1 the NF4 dequant kernel dominates decode, so this is the
+        # memory-constrained fallback rather than the default.
+        # bf16 compute avoids fp16 overflow in the dequant -> matmul path; pre-Ampere
+        # GPUs lack bf16 tensor cores, so they keep fp16.
+        compute_dtype = half_compute_dtype()
+        bnb_config = BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_compute_dtype=compute_dtype,
+            bnb_4bit_use_double_quant=True,
+            bnb_4bit_quant_type="nf4",
+        )
+        return from_pretrained(
+            weights_path,
+            quantization_config=bnb_config,
+            # Unquantized layers (vision convs, norms, embeddings) and pixel_values match
+            # the compute dtype instead of bitsandbytes' fp16 default.
+            torch_dtype=compute_dtype,
+            device_map=device_map,
+        )
+
+    return from_pretrained(
+        weights_path,
+        torch_dtype=torch.bfloat16 if quant == "bf16" else torch.float16,
+        device_map=device_map,
+    )
+
+
+class FramePreprocessor:
+    """Build OpenVLA ``pixel_values`` from a uint8 frame without the full HF processor call.
+
+    Mirrors ``PrismaticImageProcessor.apply_transform``: the frame is resized and
+    cropped in uint8 once per distinct backbone geometry (DINO and SigLIP share
+    224x224). On CUDA the uint8 crops go through a pinned staging buffer and are
+    scaled and normalized on the GPU, so only a quarter of the float32 bytes cross PCIe.
+    The result is written into a persistent buffer that each call overwrites, laid
+    out in ``memory_format`` to match the vision backbone's conv weights.
+    """
+
+    def __init__(
+        self,
+        image_processor,
+        device: str,
+        dtype: torch.dtype,
+        memory_format: torch.memory_format = torch.contiguous_format,
+    ) -> None:
+        self.image_processor = image_processor
+        self.device = device
+        self.dtype = dtype
+        self.memory_format = memory_format
+        self.letterbox = getattr(image_processor, "tvf_do_letterbox", False)
+        self.geometries = list(zip(image_processor.tvf_resize_params, image_processor.tvf_crop_params))
+        # Per-backbone normalization, stacked along channels like torch.vstack in the processor.
+        # (x / 255 - mean) / std == (x - 255 * mean) / (255 * std)
+        params = image_processor.tvf_normalize_params
+        mean = torch.tensor([m for p in params for m in p["mean"]]).view(-1, 1, 1) * 255.0
+        std = torch.tensor([s for p in params for s in p["std"]]).view(-1, 1, 1) * 255.0
+        self.mean = mean.to(device)
+        self.std = std.to(device)
+        self._staging = None
+        self._device_u8 = None
+        self._normalized = None
+        self._pixels = None
+
+    def _resized(self, image: Image.Image) -> list:
+        cache = {}
+        arrays = []
+        for resize_params, crop_params in self.geometries:
+            key = repr((resize_params, crop_params))
+            if key not in cache:
+                resized = TVF.center_crop(TVF.resize(image, **resize_params), **crop_params)
+                cache[key] = torch.from_numpy(np.array(resized)).permute(2, 0, 1)
+            arrays.append(cache[key])
+        return arrays
+
+    def _allocate(self, shape: Tuple[int, ...]) -> None:
+        on_cuda = self.device == "cuda"
+        # Crops are concatenated straight into the (pinned, on CUDA) host buffer.
+        self._staging = torch.empty(shape, dtype=torch.uint8, pin_memory=on_cuda)
+        self._device_u8 = torch.empty(shape, dtype=torch.uint8, device=self.device) if on_cuda else self._staging
+        self._normalized = torch.empty(shape, dtype=torch.float32, device=self.device)
+        self._pixels = torch.empty(shape, dtype=self.dtype, device=self.device, memory_format=self.memory_format)
+
+    def __call__(self, rgb: np.ndarray) -> torch.Tensor:
+        image = Image.fromarray(rgb)
+        if self.letterbox:
+            return self.image_processor.apply_transform(image.convert("RGB"))[None].to(self.device, self.dtype)
+        crops = self._resized(image)
+        shape = (1, sum(c.shape[0] for c in crops), *crops[0].shape[1:])
+        if self._pixels is None or tuple(self._pixels.shape) != shape:
+            self._allocate(shape)
+        torch.cat(crops, dim=0, out=self._staging[0])
+        if self._device_u8 is not self._staging:
+            self._device_u8.copy_(self._staging, non_blocking=True)
+        # Normalize in float32 before narrowing; matches the processor's CPU path to within float rounding.
+        torch.sub(self._device_u8, self.mean, out=self._normalized).div_(self.std)
+        return self._pixels.copy_(self._normalized)
+
+
+_HOST_ACTION: Dict[int, torch.Tensor] = {}
+
+
+def action_to_host(action: torch.Tensor) -> np.ndarray:
+    """Copy a (GPU) action tensor into a reused pinned buffer; sync only on this stream."""
+    if not action.is_cuda:
+        return action.float().numpy().reshape(-1)
+    numel = action.numel()
+    host = _HOST_ACTION.get(numel)
+    if host is None:
+        host = _HOST_ACTION[numel] = torch.empty(numel, dtype=torch.float32, pin_memory=True)
+    host.copy_(action.reshape(-1), non_blocking=True)
+    torch.cuda.current_stream().synchronize()
+    return host.numpy()
+
+
+FFMPEG_EXTENSIONS = {".mp4", ".mkv", ".mov", ".avi"}
+# Encoder settings used by the writer; has_nvenc() probes with the same NVENC ones.
+NVENC_PARAMS = ["-preset", "p1", "-tune", "ll"]
+X264_PARAMS = ["-preset", "ultrafast"]
+
+
+@functools.lru_cache(maxsize=None)
+def has_nvenc() -> bool:
+    """Whether h264_nvenc actually encodes on this machine, probed with a one-frame encode.
+
+    Listing the encoder is not enough: static ffmpeg builds ship it even where the
+    GPU has no NVENC (A100/H100) or the container lacks ``libnvidia-encode``.
+    """
+    if not torch.cuda.is_available():
+        return False
+    try:
+        import imageio_ffmpeg
+
+        probe = subprocess.run(
+            [
+                imageio_ffmpeg.get_ffmpeg_exe(),
+                "-hide_banner",
+                "-loglevel",
+                "error",
+                "-f",
+                "lavfi",
+                "-i",
+                "color=s=256x256",
+                "-frames:v",
+                "1",
+                "-c:v",
+                "h264_nvenc",
+                *NVENC_PARAMS,
+                "-pix_fmt",
+                "yuv420p",
+                "-f",
+                "null",
+                "-",
+            ],
+            capture_output=True,
+            timeout=30,
+        )
+    except Exception:
+        return False
+    return probe.returncode == 0
+
+
+def open_video_writer(path: str, fps: int = 20):
+    """Streaming writer: frames are encoded as they arrive instead of buffered for mimsave.
+
+    Encodes on the GPU's NVENC block when available so the CPU stays free for
+    preprocessing; otherwise falls back to libx264.
+    """
+    if os.path.splitext(path)[1].lower() not in FFMPEG_EXTENSIONS:
+        return imageio.get_writer(path, fps=fps)
+    if has_nvenc():
+        codec, ffmpeg_params = "h264_nvenc", list(NVENC_PARAMS)
+    else:
+        codec, ffmpeg_params = "libx264", list(X264_PARAMS)
+    return imageio.get_writer(
+        path,
+        fps=fps,
+        codec=codec,
+        macro_block_size=None,
+        pixelformat="yuv420p",
+        ffmpeg_params=ffmpeg_params,
+    )
+
+
 def get_rgb(obs: dict, camera_name: str) -> np.ndarray:
-    image = obs["image"][camera_name]["rgb"]
-    if image.dtype != np.uint8:
-        image = (np.clip(image, 0, 1) * 255).astype(np.uint8)
-    return image
+    # The converted frame's buffer is reused; each frame is encoded and preprocessed
+    # before the next one overwrites it.
+    return float_frame_to_uint8(obs["image"][camera_name]["rgb"])
+
+
+# Below this vector-part norm the rotation is treated as identity (as transforms3d does).
+_IDENTITY_THRESH = np.finfo(np.float64).eps * 3
+
+
+def euler_to_axangle(roll: float, pitch: float, yaw: float, scale: float = 1.0) -> Tuple[float, float, float]:
+    """Axis-angle vector (axis * angle) for static-xyz Euler angles, times ``scale``.
 
+    Closed form of ``transforms3d.euler.euler2axangle(roll, pitch, yaw)`` via the
+    unit quaternion, on Python floats to skip the per-call array machinery.
+    """
+    cr, sr = math.cos(roll * 0.5), math.sin(roll * 0.5)
+    cp, sp = math.cos(pitch * 0.5), math.sin(pitch * 0.5)
+    cy, sy = math.cos(yaw * 0.5), math.sin(yaw * 0.5)
+    w = cp * cr * cy + sp * sr * sy
+    x = cp * sr * cy - sp * cr * sy
+    y = cp * sr * sy + sp * cr * cy
+    z = cp * cr * sy - sp * sr * cy
+    norm = math.sqrt(x * x + y * y + z * z)
+    if norm < _IDENTITY_THRESH:
+        return 0.0, 0.0, 0.0
+    k = 2.0 * math.atan2(norm, w) / norm * scale
+    return x * k, y * k, z * k
 
-def action_to_env(action: np.ndarray, action_scale: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
-    action = np.asarray(action, dtype=np.float32).reshape(-1)
-    world_vector = action[:3] * action_scale
-    roll, pitch, yaw = action[3:6]
-    axis, angle = euler2axangle(roll, pitch, yaw)
-    rot_axangle = axis * angle * action_scale
-    gripper = action[6:7]
-    return world_vector, rot_axangle, gripper
+
+def action_to_env(action: np.ndarray, action_scale: float, out: np.ndarray) -> np.ndarray:
+    """Write [world_vector(3), rot_axangle(3), gripper(1)] for ``env.step`` into ``out``."""
+    if not (isinstance(action, np.ndarray) and action.ndim == 1 and action.dtype == np.float32):
+        action = np.asarray(action, dtype=np.float32).reshape(-1)
+    np.multiply(action[:3], action_scale, out=out[:3])
+    roll, pitch, yaw = action[3:6].tolist()
+    out[3:6] = euler_to_axangle(roll, pitch, yaw, action_scale)
+    out[6] = action[6]
+    return out
 
 
 def main() -> None:
     args = parse_args()
     os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    # Inference only: no autograd anywhere, let cuDNN pick kernels for the fixed input
+    # shape, and allow TF32 for any remaining FP32 matmuls and convolutions.
+    torch.set_grad_enabled(False)
+    torch.backends.cudnn.benchmark = True
+    torch.set_float32_matmul_precision("high")
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
 
     # Build env
     env = simpler_env.make(args.task)
@@ -89,60 +379,83 @@ def main() -> None:
     processor = AutoProcessor.from_pretrained(args.weights_path, trust_remote_code=True)
 
     device = "cuda" if torch.cuda.is_available() else "cpu"
-    if device == "cuda":
-        bnb_config = BitsAndBytesConfig(
-            load_in_4bit=True,
-            bnb_4bit_compute_dtype=torch.float16,
-            bnb_4bit_use_double_quant=True,
-            bnb_4bit_quant_type="nf4",
-        )
-        model = AutoModelForVision2Seq.from_pretrained(
-            args.weights_path,
-            trust_remote_code=True,
-            quantization_config=bnb_config,
-            device_map="auto",
-            low_cpu_mem_usage=True,
-        )
-    else:
-        model = AutoModelForVision2Seq.from_pretrained(
-            args.weights_path,
-            trust_remote_code=True,
-            torch_dtype=torch.float32,
-            low_cpu_mem_usage=True,
-        ).to(device)
+    model = load_model(args.weights_path, args.quant, device)
     model.eval()
 
-    instruction = env.get_language_instruction()
-    frames = []
+    # cuDNN's channels-last conv kernels are faster for the backbones' patch-embedding
+    # convs. bitsandbytes 4-bit params do not take a memory_format, so NF4 keeps NCHW.
+    memory_format = torch.contiguous_format
+    if device == "cuda" and hasattr(model, "vision_backbone") and not getattr(model, "is_loaded_in_4bit", False):
+        memory_format = torch.channels_last
+        model.vision_backbone.to(memory_format=memory_format)
 
-    for step_idx in range(args.max_steps):
-        rgb = get_rgb(obs, args.camera)
-        frames.append(rgb)
-        image = Image.fromarray(rgb)
-        prompt = f"In: What action should the robot take to {instruction}?\nOut:"
+    preprocess = FramePreprocessor(processor.image_processor, device, model.dtype, memory_format)
+
+    instruction = env.get_language_instruction()
+    prompt = f"In: What action should the robot take to {instruction}?\nOut:"
+    # The instruction is fixed for the episode: tokenize once and keep the ids on device.
+    prompt_inputs = {k: v.to(device) for k, v in processor.tokenizer(prompt, return_tensors="pt").items()}
 
-        inputs = processor(prompt, image, return_tensors="pt")
-        inputs = {k: v.to(device) for k, v in inputs.items()}
+    # pixel_values is refilled in place by preprocess, so one dict serves every step.
+    inputs = {**prompt_inputs, "pixel_values": None}
 
+    if args.compile:
+        # Reuse compiled graphs from TORCHINDUCTOR_CACHE_DIR, and leave room for the
+        # few shape variants generate() produces before Dynamo falls back to eager.
+        torch._inductor.config.fx_graph_cache = True
+        torch._dynamo.config.cache_size_limit = 64
+        # Compile the decoder that generate() calls once per action token; the HF
+        # wrapper itself has data-dependent control flow, so no fullgraph.
+        model.language_model = torch.compile(model.language_model, mode="reduce-overhead", fullgraph=False)
+        # Warm up with a production-shaped input so compilation stays out of the rollout.
         with torch.inference_mode():
+            inputs["pixel_values"] = preprocess(get_rgb(obs, args.camera))
+            model.predict_action(**inputs, unnorm_key=args.unnorm_key, do_sample=False)
+
+    # Closing the writer (also on errors) finalizes the file. Frames are encoded on a
+    # background thread while the GPU decodes the action; the next frame depends on
+    # this step's action, so encoding is the work that can overlap. One inference_mode
+    # scope covers the rollout, including preprocessing outside predict_action.
+    with open_video_writer(args.save_video, fps=20) as writer, ThreadPoolExecutor(
+        max_workers=1
+    ) as encoder, torch.inference_mode():
+        pending_write = None
+        success_step = None
+        # Filled in place by action_to_env each step; float64 like the old concatenate.
+        action_buf = np.empty(7, dtype=np.float64)
+        for step_idx in range(args.max_steps):
+            if pending_write is not None:
+                # get_rgb may reuse the previous frame's buffer.
+                pending_write.result()
+            rgb = get_rgb(obs, args.camera)
+            pending_write = encoder.submit(writer.append_data, rgb)
+
+            inputs["pixel_values"] = preprocess(rgb)
+
             action = model.predict_action(
                 **inputs,
                 unnorm_key=args.unnorm_key,
                 do_sample=False,
             )
 
-        if isinstance(action, torch.Tensor):
-            action = action.detach().cpu().numpy()
-        world_vector, rot_axangle, gripper = action_to_env(action, args.action_scale)
+            if isinstance(action, torch.Tensor):
+                action = action_to_host(action)
+            obs, reward, terminated, truncated, info = env.step(
+                action_to_env(action, args.action_scale, out=action_buf)
+            )
 
-        obs, reward, terminated, truncated, info = env.step(
-            np.concatenate([world_vector, rot_axangle, gripper])
-        )
+            if terminated or truncated:
+                break
+            if args.early_stop_steps >= 0 and info.get("success", False):
+                if success_step is None:
+                    success_step = step_idx
+                    print(f"Success at step {step_idx}.")
+                if step_idx - success_step >= args.early_stop_steps:
+                    break
 
-        if terminated or truncated:
-            break
+        if pending_write is not None:
+            pending_write.result()
 
-    imageio.mimsave(args.save_video, frames, fps=20)
     print(f"Saved {args.save_video}")
 
 